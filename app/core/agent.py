@@ -3,16 +3,64 @@
 from langchain_community.chat_models import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
-from typing import Dict, Any
+from langchain_core.outputs import Generation
+from pydantic import TypeAdapter
+from typing import Dict, Any, Iterator, List, Tuple
+import asyncio
+import hashlib
+import json
 import logging
+import re
 
 from app.core.config import settings
-from app.core.models import Question, Evaluation
+from app.core.models import Question, Evaluation, normalize_formula
+from app.database.redis_db import get_redis_connection
 
 # --- Configure Logging ---
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Evaluations are deterministic (temperature=0.0), so identical submissions
+# for the same question can be served from Redis instead of the LLM.
+EVAL_CACHE_PREFIX = "eval_cache"
+EVAL_CACHE_TTL = 7 * 86400  # 7-day expiry
+
+# Built once so the hot path goes straight to the compiled validator
+_EVAL_ADAPTER = TypeAdapter(Evaluation)
+
+# Static part of the evaluation prompt. Keep anything that varies per
+# submission out of here so the prompt prefix stays identical across calls.
+SYSTEM_PROMPT = """
+You are an expert Excel formula evaluator for a technical interview.
+Your task is to assess a candidate's submitted formula for a specific task.
+Evaluate the formula strictly based on the provided criteria.
+Provide your evaluation in a valid JSON format.
+
+{format_instructions}
+"""
+
+HUMAN_PROMPT = """
+**Task Context:**
+- Task Description: {task_description}
+- Evaluation Criteria: {evaluation_criteria}
+
+**Candidate's Submission:**
+- Formula: "{candidate_formula}"
+
+**Your Evaluation:**
+- Please provide your detailed assessment below.
+"""
+
+
+def _is_complete_json(text: str) -> bool:
+    """Whether the LLM output (optionally wrapped in a markdown code fence) is complete, valid JSON."""
+    fenced = re.search(r"```(?:json)?\s*(.*?)\s*```", text, re.DOTALL)
+    try:
+        json.loads(fenced.group(1) if fenced else text)
+        return True
+    except ValueError:
+        return False
+
+
 class ExcelAgent:
     """
     The AI agent responsible for evaluating candidate responses.
@@ -24,43 +72,85 @@ class ExcelAgent:
                 model=settings.OLLAMA_MODEL,
                 base_url=settings.OLLAMA_HOST,
                 temperature=0.0,  # We want deterministic, consistent evaluations
-                keep_alive=-1 # Keep the model loaded in memory
+                keep_alive=-1, # Keep the model loaded in memory
+                timeout=settings.OLLAMA_TIMEOUT, # Fail instead of hanging if the server stalls
+                num_ctx=settings.OLLAMA_NUM_CTX, # Large enough to keep the static prompt prefix in the KV-cache
+                num_predict=settings.OLLAMA_NUM_PREDICT, # Evaluations are short, so cap generation
+                format="json" # Constrain generation to valid JSON for the output parser
             )
-            logger.info(f"ChatOllama initialized successfully with model '{settings.OLLAMA_MODEL}'.")
+            logger.info("ChatOllama initialized successfully with model '%s'.", settings.OLLAMA_MODEL)
         except Exception as e:
-            logger.error(f"Failed to initialize ChatOllama: {e}")
+            logger.error("Failed to initialize ChatOllama: %s", e)
             self.llm = None
-        
+
+        # Redis connection used for the exact-match evaluation cache
+        self.redis = get_redis_connection()
+
+        # Vector-similarity cache that catches near-duplicate formulas.
+        # Off by default: formulas that differ by a single token (e.g. D2*0.05 vs D2*0.5)
+        # can sit within the distance threshold yet deserve different grades.
+        self.semantic_cache = None
+        if settings.SEMANTIC_CACHE_ENABLED:
+            self.semantic_cache = self._init_semantic_cache()
+
         # Define the Pydantic model for the output parser
         self.parser = JsonOutputParser(pydantic_object=Evaluation)
+        # The format instructions are constant, so render the schema once
+        self._format_instructions = self.parser.get_format_instructions()
 
-        # Define the prompt template for the evaluation
-        self.prompt = ChatPromptTemplate.from_template(
-            """
-            System: You are an expert Excel formula evaluator for a technical interview.
-            Your task is to assess a candidate's submitted formula for a specific task.
-            Evaluate the formula strictly based on the provided criteria.
-            Provide your evaluation in a valid JSON format.
-
-            **Task Context:**
-            - Task Description: {task_description}
-            - Evaluation Criteria: {evaluation_criteria}
-
-            **Candidate's Submission:**
-            - Formula: "{candidate_formula}"
-
-            **Your Evaluation:**
-            - Please provide your detailed assessment below.
-            {format_instructions}
-            """
-        )
+        # Define the prompt template for the evaluation.
+        # All static instructions live in the system message and the per-submission
+        # fields come last, so Ollama can reuse the KV-cache for the shared prefix.
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT),
+            ("human", HUMAN_PROMPT),
+        ]).partial(format_instructions=self._format_instructions)
+
+        # Fingerprint of everything besides the question that shapes an evaluation.
+        # It is part of every cache key, so changing the model or prompt invalidates old entries.
+        self._prompt_fingerprint = hashlib.sha256(
+            "|".join([
+                settings.OLLAMA_MODEL,
+                SYSTEM_PROMPT.format(format_instructions=self._format_instructions),
+                HUMAN_PROMPT,
+            ]).encode()
+        ).hexdigest()
         
         # Chain the components together
         if self.llm:
-            self.chain = self.prompt | self.llm | self.parser
+            # The parser is applied in _handle_result, which also needs the raw text
+            # to tell complete output apart from output cut off by num_predict.
+            self.chain = self.prompt | self.llm
         else:
             self.chain = None
 
+    def _init_semantic_cache(self):
+        """
+        Creates the semantic evaluation cache, or returns None if it cannot be set up.
+        redisvl and sentence-transformers are optional dependencies, so they are only
+        imported when the cache is enabled.
+        """
+        try:
+            from redisvl.extensions.cache.llm import SemanticCache
+            from redisvl.utils.vectorize import HFTextVectorizer
+
+            semantic_cache = SemanticCache(
+                name="excel_eval_cache",
+                redis_url=settings.redis_url,
+                distance_threshold=settings.SEMANTIC_CACHE_DISTANCE_THRESHOLD,
+                ttl=EVAL_CACHE_TTL,
+                vectorizer=HFTextVectorizer(model=settings.SEMANTIC_CACHE_EMBEDDING_MODEL),
+                filterable_fields=[
+                    {"name": "question_id", "type": "tag"},
+                    {"name": "cache_version", "type": "tag"},
+                ],
+            )
+            logger.info("Semantic evaluation cache initialized successfully.")
+            return semantic_cache
+        except Exception as e:
+            logger.error("Failed to initialize semantic evaluation cache: %s", e)
+            return None
+
     def evaluate_formula(self, question: Question, candidate_formula: str) -> Evaluation | None:
         """
         Evaluates the candidate's formula for a given question.
@@ -76,34 +166,219 @@ class ExcelAgent:
             logger.error("Evaluation chain is not initialized. Cannot evaluate.")
             return None
 
+        cached_evaluation = self._lookup_caches(question, candidate_formula)
+        if cached_evaluation:
+            return cached_evaluation
+
         try:
-            logger.info(f"Invoking evaluation chain for question '{question.id}'...")
-            
-            # Prepare the input for the chain
-            chain_input = {
-                "task_description": question.task_description,
-                "evaluation_criteria": question.evaluation_criteria,
-                "candidate_formula": candidate_formula,
-                "format_instructions": self.parser.get_format_instructions(),
-            }
+            logger.info("Invoking evaluation chain for question '%s'...", question.id)
             
             # Invoke the chain and get the structured output
-            evaluation_result = self.chain.invoke(chain_input)
-            
-            # Pydantic will have already validated the structure, but we can log it
-            logger.info(f"Evaluation successful. Score: {evaluation_result['score']}.")
-            
-            # The parser returns a dict, so we instantiate our model from it
-            return Evaluation(**evaluation_result)
+            message = self.chain.invoke(self._build_chain_input(question, candidate_formula))
+            return self._handle_result(question, candidate_formula, message.content)
+
+        except Exception as e:
+            logger.error("An error occurred during formula evaluation: %s", e, exc_info=True)
+            return self._error_evaluation()
+
+    async def aevaluate_formula(self, question: Question, candidate_formula: str) -> Evaluation | None:
+        """
+        Async counterpart of evaluate_formula. Awaits the chain instead of blocking,
+        so several evaluations can be in flight against Ollama at once.
+        """
+        if not self.chain:
+            logger.error("Evaluation chain is not initialized. Cannot evaluate.")
+            return None
+
+        # Cache lookups and writes use blocking Redis (and embedding) calls,
+        # so run them in a worker thread to keep the event loop free.
+        cached_evaluation = await asyncio.to_thread(self._lookup_caches, question, candidate_formula)
+        if cached_evaluation:
+            return cached_evaluation
+
+        try:
+            logger.info("Invoking evaluation chain asynchronously for question '%s'...", question.id)
+            message = await self.chain.ainvoke(self._build_chain_input(question, candidate_formula))
+            return await asyncio.to_thread(self._handle_result, question, candidate_formula, message.content)
+
+        except Exception as e:
+            logger.error("An error occurred during formula evaluation: %s", e, exc_info=True)
+            return self._error_evaluation()
+
+    async def aevaluate_batch(self, pairs: List[Tuple[Question, str]]) -> List[Evaluation | None]:
+        """
+        Evaluates several (question, formula) pairs concurrently.
+
+        Args:
+            pairs: A list of (Question, candidate_formula) tuples.
+
+        Returns:
+            A list of Evaluation objects in the same order as the input pairs.
+        """
+        # aevaluate_formula falls back to an error evaluation itself, so the
+        # tasks never raise and their results can be returned as-is.
+        tasks = [self.aevaluate_formula(question, formula) for question, formula in pairs]
+        return list(await asyncio.gather(*tasks))
+
+    def stream_evaluate(self, question: Question, candidate_formula: str) -> Iterator[Dict[str, Any]]:
+        """
+        Streams the evaluation of the candidate's formula as it is generated.
+
+        Yields partial evaluation dicts as fields become available in the LLM output.
+        The last yielded dict is always a complete, validated evaluation, so callers
+        can build the final result with Evaluation(**last_chunk).
+        Yields nothing if the evaluation chain is not initialized.
+        """
+        if not self.chain:
+            logger.error("Evaluation chain is not initialized. Cannot evaluate.")
+            return
+
+        cached_evaluation = self._lookup_caches(question, candidate_formula)
+        if cached_evaluation:
+            yield cached_evaluation.model_dump()
+            return
+
+        try:
+            logger.info("Streaming evaluation chain for question '%s'...", question.id)
+
+            # Parse the accumulated text leniently to emit progressively more complete dicts
+            output_text = ""
+            last_partial = None
+            for chunk in self.chain.stream(self._build_chain_input(question, candidate_formula)):
+                output_text += chunk.content
+                partial_result = self.parser.parse_result([Generation(text=output_text)], partial=True)
+                if partial_result and partial_result != last_partial:
+                    last_partial = partial_result
+                    yield partial_result
+
+            evaluation = self._handle_result(question, candidate_formula, output_text)
+        except Exception as e:
+            logger.error("An error occurred during formula evaluation: %s", e, exc_info=True)
+            evaluation = self._error_evaluation()
+
+        yield evaluation.model_dump()
+
+    def _build_chain_input(self, question: Question, candidate_formula: str) -> Dict[str, Any]:
+        """Prepares the input for the evaluation chain."""
+        return {
+            "task_description": question.task_description,
+            "evaluation_criteria": question.evaluation_criteria,
+            "candidate_formula": candidate_formula,
+        }
+
+    def _handle_result(self, question: Question, candidate_formula: str, output_text: str) -> Evaluation:
+        """Parses and validates the raw LLM output and stores complete results in the caches."""
+        evaluation_result = self.parser.parse(output_text)
+        logger.info("Evaluation successful. Score: %s.", evaluation_result['score'])
+
+        # The parser returns a dict, so we instantiate our model from it
+        evaluation = _EVAL_ADAPTER.validate_python(evaluation_result)
+
+        # JsonOutputParser also accepts JSON cut off at the num_predict cap (e.g. a
+        # half-sentence feedback), so only cache output that is complete JSON.
+        if not _is_complete_json(output_text):
+            logger.warning("LLM output for question '%s' was truncated; not caching the evaluation.", question.id)
+            return evaluation
+
+        self._cache_evaluation(self._cache_key(question, candidate_formula), evaluation)
+        self._semantic_cache_evaluation(question, candidate_formula, evaluation)
+        return evaluation
 
+    def _error_evaluation(self) -> Evaluation:
+        """In case of a parsing or LLM error, return a default error evaluation."""
+        return Evaluation(
+            score=1,
+            is_correct=False,
+            feedback="An error occurred while evaluating the response. Please ensure the formula is valid or try again."
+        )
+
+    def _lookup_caches(self, question: Question, candidate_formula: str) -> Evaluation | None:
+        """Checks the exact-match cache, then the semantic cache."""
+        cache_key = self._cache_key(question, candidate_formula)
+        cached_evaluation = self._get_cached_evaluation(cache_key)
+        if cached_evaluation:
+            logger.info("Evaluation cache hit for question '%s'.", question.id)
+            return cached_evaluation
+
+        cached_evaluation = self._get_semantic_cached_evaluation(question, candidate_formula)
+        if cached_evaluation:
+            logger.info("Semantic cache hit for question '%s'.", question.id)
+            # Promote to the exact-match cache so the next identical submission is cheaper
+            self._cache_evaluation(cache_key, cached_evaluation)
+            return cached_evaluation
+        return None
+
+    def _cache_version(self, question: Question) -> str:
+        """Identifies the model, prompt and evaluation criteria a cached evaluation was made with."""
+        return hashlib.sha256(
+            f"{self._prompt_fingerprint}|{question.evaluation_criteria}".encode()
+        ).hexdigest()
+
+    def _cache_key(self, question: Question, candidate_formula: str) -> str:
+        """
+        Builds the Redis key for a (question, formula) pair. Only surrounding whitespace
+        is stripped: case and string literals matter to functions like FIND and EXACT,
+        so any other difference must map to a different entry.
+        """
+        digest = hashlib.sha256(
+            f"{self._cache_version(question)}|{question.id}|{candidate_formula.strip()}".encode()
+        ).hexdigest()
+        return f"{EVAL_CACHE_PREFIX}:{digest}"
+
+    def _get_cached_evaluation(self, cache_key: str) -> Evaluation | None:
+        """Returns a previously cached Evaluation, or None on a miss or Redis error."""
+        try:
+            cached_value = self.redis.get(cache_key)
+            if cached_value:
+                return _EVAL_ADAPTER.validate_json(cached_value)
+        except Exception as e:
+            logger.warning("Could not read from evaluation cache: %s", e)
+        return None
+
+    def _cache_evaluation(self, cache_key: str, evaluation: Evaluation):
+        """Stores a successful Evaluation in Redis. Cache failures are non-fatal."""
+        try:
+            self.redis.set(cache_key, evaluation.model_dump_json(), ex=EVAL_CACHE_TTL)
         except Exception as e:
-            logger.error(f"An error occurred during formula evaluation: {e}", exc_info=True)
-            # In case of a parsing or LLM error, return a default error evaluation
-            return Evaluation(
-                score=1,
-                is_correct=False,
-                feedback="An error occurred while evaluating the response. Please ensure the formula is valid or try again."
+            logger.warning("Could not write to evaluation cache: %s", e)
+
+    def _semantic_prompt(self, question: Question, candidate_formula: str) -> str:
+        """Builds the text that is embedded for the semantic cache lookup."""
+        return f"{question.id}||{normalize_formula(candidate_formula)}"
+
+    def _get_semantic_cached_evaluation(self, question: Question, candidate_formula: str) -> Evaluation | None:
+        """Returns the Evaluation of a near-duplicate submission for the same question, if any."""
+        if not self.semantic_cache:
+            return None
+        try:
+            from redisvl.query.filter import Tag
+
+            hits = self.semantic_cache.check(
+                prompt=self._semantic_prompt(question, candidate_formula),
+                num_results=1,
+                filter_expression=(
+                    (Tag("question_id") == question.id)
+                    & (Tag("cache_version") == self._cache_version(question))
+                ),
             )
+            if hits:
+                return _EVAL_ADAPTER.validate_json(hits[0]["response"])
+        except Exception as e:
+            logger.warning("Could not read from semantic evaluation cache: %s", e)
+        return None
+
+    def _semantic_cache_evaluation(self, question: Question, candidate_formula: str, evaluation: Evaluation):
+        """Stores a successful Evaluation in the semantic cache. Cache failures are non-fatal."""
+        if not self.semantic_cache:
+            return
+        try:
+            self.semantic_cache.store(
+                prompt=self._semantic_prompt(question, candidate_formula),
+                response=evaluation.model_dump_json(),
+                filters={"question_id": question.id, "cache_version": self._cache_version(question)},
+            )
+        except Exception as e:
+            logger.warning("Could not write to semantic evaluation cache: %s", e)
 
 # Create a single, importable instance of the agent
 excel_agent = ExcelAgent()
\ No newline at end of file
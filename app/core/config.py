@@ -25,6 +25,12 @@ class Settings(BaseSettings):
     REDIS_PORT: int = Field(6379, description="Redis server port.")
     REDIS_PASSWORD: str | None = Field(None, description="Redis server password, if any.")
 
+    @property
+    def redis_url(self) -> str:
+        """Generates the Redis connection URL."""
+        auth = f":{self.REDIS_PASSWORD}@" if self.REDIS_PASSWORD else ""
+        return f"redis://{auth}{self.REDIS_HOST}:{self.REDIS_PORT}/0"
+
     # --- PostgreSQL Configuration ---
     POSTGRES_HOST: str = Field(..., description="PostgreSQL server host.")
     POSTGRES_PORT: int = Field(5432, description="PostgreSQL server port.")
@@ -39,7 +45,15 @@ class Settings(BaseSettings):
 
     # --- Ollama AI Configuration ---
     OLLAMA_HOST: str = Field(..., description="URL for the Ollama server.")
-    OLLAMA_MODEL: str = Field("llama3:8b", description="The LLM model to use for the agent.")
+    OLLAMA_MODEL: str = Field("llama3:8b-instruct-q4_K_M", description="The LLM model to use for the agent.")
+    OLLAMA_NUM_CTX: int = Field(2048, description="Context window size (in tokens) for the Ollama model.")
+    OLLAMA_TIMEOUT: int = Field(120, description="Timeout (in seconds) for requests to the Ollama server.")
+    OLLAMA_NUM_PREDICT: int = Field(256, description="Maximum number of tokens the model may generate per evaluation.")
+
+    # --- Semantic Cache Configuration ---
+    SEMANTIC_CACHE_ENABLED: bool = Field(False, description="Serve evaluations of near-duplicate formulas from the semantic cache. Keep off until the threshold is validated on formulas that differ by a single token.")
+    SEMANTIC_CACHE_EMBEDDING_MODEL: str = Field("redis/langcache-embed-v1", description="Embedding model used by the semantic evaluation cache.")
+    SEMANTIC_CACHE_DISTANCE_THRESHOLD: float = Field(0.05, description="Maximum vector distance for a semantic cache hit.")
 
     class Config:
         # This tells Pydantic to look for a .env file.
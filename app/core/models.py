@@ -1,14 +1,41 @@
 # app/core/models.py
 
 from pydantic import BaseModel, Field
+from functools import cached_property
 import pandas as pd
-from typing import Any, Dict, List
+import re
+from typing import Any, Dict, FrozenSet, List
+
+
+def normalize_formula(formula: str) -> str:
+    """Lowercases a formula and collapses whitespace for cache keys and similarity matching."""
+    return re.sub(r"\s+", " ", formula).strip().lower()
+
+
+def normalize_canonical_formula(formula: str) -> str:
+    """
+    Lowercases a formula and removes all whitespace outside string literals,
+    so e.g. '=IF(C2="Sales", D2*0.05, 0)' matches '=IF(C2="Sales",D2*0.05,0)'.
+    """
+    normalized = []
+    in_string = False
+    for char in formula.strip():
+        # Excel escapes quotes inside literals as "", which simply toggles twice
+        if char == '"':
+            in_string = not in_string
+        elif char.isspace() and not in_string:
+            continue
+        normalized.append(char)
+    return "".join(normalized).lower()
+
 
 class Question(BaseModel):
     """
     Represents a single interview question/task.
     This model validates the structure of each entry in questions.json.
     """
+    model_config = {"ignored_types": (cached_property,)}
+
     id: str = Field(..., description="Unique identifier for the question.")
     topic: str = Field(..., description="The category of the question, e.g., 'Formulas & Functions'.")
     difficulty: str = Field(..., description="Difficulty level, e.g., 'Easy', 'Intermediate', 'Hard'.")
@@ -26,6 +53,10 @@ class Question(BaseModel):
     # The evaluation prompt for the LLM, focusing on the "how".
     evaluation_criteria: str = Field(..., description="Specific criteria for the LLM to evaluate the user's formula.")
 
+    # Known-good formulas for this task. A correct final state combined with one of
+    # these formulas is scored without calling the LLM.
+    canonical_formulas: List[str] = Field(default_factory=list, description="Known-good formulas for this task.")
+
     def get_starting_df(self) -> pd.DataFrame:
         """Helper to convert starting_data dict to a DataFrame."""
         return pd.DataFrame(self.starting_data)
@@ -34,6 +65,15 @@ class Question(BaseModel):
         """Helper to convert solution_data dict to a DataFrame."""
         return pd.DataFrame(self.solution_data)
 
+    @cached_property
+    def normalized_canonical_formulas(self) -> FrozenSet[str]:
+        """The canonical formulas, normalized once per question."""
+        return frozenset(normalize_canonical_formula(f) for f in self.canonical_formulas)
+
+    def is_canonical_formula(self, formula: str) -> bool:
+        """Whether the formula matches one of the canonical formulas, ignoring case and whitespace."""
+        return normalize_canonical_formula(formula) in self.normalized_canonical_formulas
+
 
 class Evaluation(BaseModel):
     """
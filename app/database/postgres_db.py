@@ -2,15 +2,16 @@
 
 import psycopg2
 from psycopg2 import pool
-import json
-from typing import Dict, Any
+from psycopg2.extras import execute_values
+import orjson
+import zstandard
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 from datetime import datetime
 
 from app.core.config import settings
 
 # --- Configure Logging ---
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- Initialize PostgreSQL Connection Pool ---
@@ -25,10 +26,47 @@ try:
     )
     logger.info("PostgreSQL connection pool created successfully.")
 except psycopg2.OperationalError as e:
-    logger.error(f"Could not connect to PostgreSQL database: {e}")
+    logger.error("Could not connect to PostgreSQL database: %s", e)
     pg_pool = None
 
 
+def _json_default(o):
+    """Converts Pydantic models to dicts for JSON serialization."""
+    if hasattr(o, 'model_dump'):
+        return o.model_dump()
+    raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
+
+
+def compress_transcript(session_state: Dict[str, Any], final_dataframes: Optional[List[Optional[Dict[str, List[Any]]]]] = None) -> bytes:
+    """
+    Builds a lean transcript of the interview and compresses it with zstd.
+    Questions are static, so only their IDs are kept; the full questions
+    can be looked up again from questions.json. The candidate's final tables
+    (in to_dict('list') form, one per answer) are stored with their answers.
+    """
+    answers = session_state.get('user_answers', [])
+    if final_dataframes is not None:
+        answers = [
+            {**answer, "final_dataframe": final_dataframe}
+            for answer, final_dataframe in zip(answers, final_dataframes)
+        ]
+
+    transcript = {
+        "session_id": session_state['session_id'],
+        "start_time": session_state.get('start_time'),
+        "end_time": session_state.get('end_time'),
+        "question_ids": [q.id for q in session_state.get('questions', [])],
+        "answers": answers,
+        "evaluations": session_state.get('evaluations', []),
+    }
+    return zstandard.ZstdCompressor(level=3).compress(orjson.dumps(transcript, default=_json_default))
+
+
+def decompress_transcript(data: bytes) -> Dict[str, Any]:
+    """Restores a transcript stored by compress_transcript."""
+    return orjson.loads(zstandard.ZstdDecompressor().decompress(data))
+
+
 def init_db():
     """
     Initializes the database by creating the 'interview_results' table
@@ -49,13 +87,20 @@ def init_db():
                     end_time TIMESTAMPTZ,
                     final_score REAL,
                     feedback_summary TEXT,
-                    full_transcript JSONB
+                    full_transcript JSONB,
+                    full_transcript_zst BYTEA
                 );
             """)
+            # full_transcript (JSONB) is kept, nullable, on every install so the schema does
+            # not depend on deployment history: it holds the uncompressed transcripts of rows
+            # saved before compression. New rows only write full_transcript_zst, and
+            # upserts over a legacy row set full_transcript to NULL.
+            # Tables created before compression lack the new column, so add it here.
+            cur.execute("ALTER TABLE interview_results ADD COLUMN IF NOT EXISTS full_transcript_zst BYTEA;")
             conn.commit()
             logger.info("Database initialized: 'interview_results' table is ready.")
     except psycopg2.Error as e:
-        logger.error(f"Error during database initialization: {e}")
+        logger.error("Error during database initialization: %s", e)
         if conn:
             conn.rollback()
     finally:
@@ -63,51 +108,109 @@ def init_db():
             pg_pool.putconn(conn)
 
 
-def save_interview_report(session_state: Dict[str, Any]):
+# Using parameterized queries (%s) is crucial to prevent SQL injection.
+_UPSERT_REPORT_SQL = """
+    INSERT INTO interview_results (session_id, start_time, end_time, final_score, feedback_summary, full_transcript_zst)
+    VALUES {values}
+    ON CONFLICT (session_id) DO UPDATE SET
+        end_time = EXCLUDED.end_time,
+        final_score = EXCLUDED.final_score,
+        feedback_summary = EXCLUDED.feedback_summary,
+        full_transcript_zst = EXCLUDED.full_transcript_zst,
+        -- Clear any legacy JSONB transcript so the compressed one is the only current copy
+        full_transcript = NULL;
+"""
+
+
+def _evaluation_dicts(session_state: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
-    Saves the final report of a completed interview to the PostgreSQL database.
+    Returns the session's evaluations as dicts. States loaded through
+    SessionManager.get_session_state hold Evaluation models instead of dicts.
     """
-    if not pg_pool:
-        logger.error("Could not save report because connection pool is unavailable.")
-        return
+    return [
+        e.model_dump() if hasattr(e, 'model_dump') else e
+        for e in session_state.get('evaluations', [])
+    ]
+
+
+def _build_report_row(session_state: Dict[str, Any], final_dataframes: Optional[List[Optional[Dict[str, List[Any]]]]] = None) -> Tuple:
+    """Builds the interview_results row for a completed interview."""
+    evaluations = _evaluation_dicts(session_state)
 
     # A simple calculation for a final score (e.g., average score)
-    scores = [e.get('score', 0) for e in session_state.get('evaluations', [])]
+    scores = [e.get('score', 0) for e in evaluations]
     final_score = sum(scores) / len(scores) if scores else 0.0
 
     # A summary of feedback
-    feedback_items = [e.get('feedback', '') for e in session_state.get('evaluations', [])]
+    feedback_items = [e.get('feedback', '') for e in evaluations]
     feedback_summary = "\n".join(f"- {fb}" for fb in feedback_items)
+
+    return (
+        session_state['session_id'],
+        session_state.get('start_time'),
+        # Keep the real completion time so replays/backfills don't overwrite it;
+        # fall back to a timezone-aware now() for states without one.
+        session_state.get('end_time') or datetime.now().astimezone(),
+        final_score,
+        feedback_summary,
+        psycopg2.Binary(compress_transcript(session_state, final_dataframes)) # Compressed lean transcript for the BYTEA column
+    )
+
+
+def save_interview_report(session_state: Dict[str, Any], final_dataframes: Optional[List[Optional[Dict[str, List[Any]]]]] = None):
+    """
+    Saves the final report of a completed interview to the PostgreSQL database.
+    final_dataframes holds the candidate's final table for each answer, if available.
+    """
+    if not pg_pool:
+        logger.error("Could not save report because connection pool is unavailable.")
+        return
+
+    params = _build_report_row(session_state, final_dataframes)
     
     conn = None
     try:
         conn = pg_pool.getconn()
         with conn.cursor() as cur:
-            # Using parameterized queries (%s) is crucial to prevent SQL injection.
-            sql = """
-                INSERT INTO interview_results (session_id, start_time, end_time, final_score, feedback_summary, full_transcript)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (session_id) DO UPDATE SET
-                    end_time = EXCLUDED.end_time,
-                    final_score = EXCLUDED.final_score,
-                    feedback_summary = EXCLUDED.feedback_summary,
-                    full_transcript = EXCLUDED.full_transcript;
-            """
-            params = (
-                session_state['session_id'],
-                session_state.get('start_time'),
-                datetime.now().astimezone(), # Use timezone-aware datetime for end_time
-                final_score,
-                feedback_summary,
-                json.dumps(session_state) # Convert the entire state to a JSON string for the JSONB column
-            )
-            cur.execute(sql, params)
+            cur.execute(_UPSERT_REPORT_SQL.format(values="(%s, %s, %s, %s, %s, %s)"), params)
+            conn.commit()
+            logger.info("Successfully saved report for session_id: %s", session_state['session_id'])
+    except psycopg2.Error as e:
+        logger.error("Error saving interview report for session %s: %s", session_state.get('session_id'), e)
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            pg_pool.putconn(conn)
+
+
+def save_interview_reports_bulk(session_states: List[Dict[str, Any]], page_size: int = 100):
+    """
+    Saves the final reports of several completed interviews in batched INSERTs,
+    e.g. for replays or backfills. All rows are committed in one transaction.
+    """
+    if not pg_pool:
+        logger.error("Could not save reports because connection pool is unavailable.")
+        return
+    if not session_states:
+        return
+
+    # ON CONFLICT cannot touch the same row twice in one statement, so keep
+    # only the latest state per session.
+    latest_states = {state['session_id']: state for state in session_states}
+    rows = [_build_report_row(state) for state in latest_states.values()]
+
+    conn = None
+    try:
+        conn = pg_pool.getconn()
+        with conn.cursor() as cur:
+            execute_values(cur, _UPSERT_REPORT_SQL.format(values="%s"), rows, page_size=page_size)
             conn.commit()
-            logger.info(f"Successfully saved report for session_id: {session_state['session_id']}")
+            logger.info("Successfully saved %s interview reports.", len(rows))
     except psycopg2.Error as e:
-        logger.error(f"Error saving interview report for session {session_state.get('session_id')}: {e}")
+        logger.error("Error saving %s interview reports: %s", len(rows), e)
         if conn:
             conn.rollback()
     finally:
         if conn:
-            pg_pool.putconn(conn)
\ No newline at end of file
+            pg_pool.putconn(conn)
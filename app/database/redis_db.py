@@ -1,12 +1,19 @@
 # app/database/redis_db.py
 
 import redis
-import json
+import orjson
+import logging
+import pandas as pd
+import pyarrow as pa
+from pydantic import TypeAdapter
 from typing import Dict, Any, List, Optional
 
 from app.core.config import settings
 from app.core.models import Question, Evaluation
 
+# --- Configure Logging ---
+logger = logging.getLogger(__name__)
+
 # --- Initialize Redis Connection ---
 # We use connection pooling for efficiency.
 redis_pool = redis.ConnectionPool(
@@ -17,57 +24,187 @@ redis_pool = redis.ConnectionPool(
     decode_responses=True # Decode responses from bytes to utf-8 strings
 )
 
+# A single client bound to the pool. redis-py clients are thread-safe and
+# check out a pooled connection per command, so one instance can be shared.
+_redis_client = redis.Redis(connection_pool=redis_pool)
+
 def get_redis_connection():
-    """Returns an active Redis connection from the pool."""
-    return redis.Redis(connection_pool=redis_pool)
+    """Returns the shared Redis client backed by the connection pool."""
+    return _redis_client
+
+# Binary payloads (e.g. Arrow-encoded DataFrames) must not be utf-8 decoded,
+# so they go through a separate pool with decode_responses disabled.
+redis_binary_pool = redis.ConnectionPool(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    password=settings.REDIS_PASSWORD,
+    db=0,
+    decode_responses=False
+)
+_redis_binary_client = redis.Redis(connection_pool=redis_binary_pool)
+
+def get_redis_binary_connection():
+    """Returns the shared Redis client for raw bytes values."""
+    return _redis_binary_client
+
+
+SESSION_TTL = 86400  # 24-hour expiry
+
+# Validators for re-hydrating whole lists of models in a single pass
+_QUESTIONS_ADAPTER = TypeAdapter(List[Question])
+_EVALUATIONS_ADAPTER = TypeAdapter(List[Evaluation])
+
+# Slices of the session state that are not stored as plain hash fields.
+# Questions are written once at session creation; answers and evaluations
+# are appended to their own lists as the candidate submits.
+QUESTIONS_FIELD = "questions"
+LIST_FIELDS = ("user_answers", "evaluations")
 
 
 class SessionManager:
     """
     Manages user interview sessions using Redis.
+
+    Each session is stored as a Redis Hash (one field per top-level value,
+    JSON-encoded) plus one Redis List per entry in LIST_FIELDS, so a
+    submission only writes what changed instead of the whole state.
     """
     def __init__(self, session_id: str):
         self.redis_conn = get_redis_connection()
+        self.redis_binary_conn = get_redis_binary_connection()
         self.session_id = session_id
-        self.session_key = f"interview_session:{self.session_id}"
+        # Versioned prefix: sessions saved before the hash layout are plain string
+        # keys at interview_session:<id>, and hash commands on them fail with WRONGTYPE.
+        self.session_key = f"interview_session:v2:{self.session_id}"
+
+    def _list_key(self, field: str) -> str:
+        """Returns the Redis key of the list that holds the given state slice."""
+        return f"{self.session_key}:{field}"
 
-    def _serialize_data(self, data: Dict[str, Any]) -> str:
-        """Serializes session data to a JSON string."""
+    def _serialize_data(self, data: Any) -> str:
+        """Serializes a single session value to a JSON string."""
         # Pydantic models need to be converted to dicts for JSON serialization
         def default_serializer(o):
             if hasattr(o, 'model_dump'):
                 return o.model_dump()
             raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
         
-        return json.dumps(data, default=default_serializer)
+        return orjson.dumps(data, default=default_serializer).decode()
 
-    def _deserialize_data(self, json_str: str) -> Dict[str, Any]:
-        """Deserializes JSON string back to a Python dictionary."""
-        data = json.loads(json_str)
+    def _deserialize_data(self, fields: Dict[str, str], lists: Dict[str, List[str]]) -> Dict[str, Any]:
+        """Deserializes the stored hash fields and lists back to a Python dictionary."""
+        data = {field: orjson.loads(value) for field, value in fields.items()}
+        for field, items in lists.items():
+            data[field] = [orjson.loads(item) for item in items]
         # Re-hydrate Pydantic models from dicts
         if 'questions' in data:
-            data['questions'] = [Question(**q) for q in data['questions']]
+            data['questions'] = _QUESTIONS_ADAPTER.validate_python(data['questions'])
         if 'evaluations' in data:
-            data['evaluations'] = [Evaluation(**e) for e in data['evaluations']]
+            data['evaluations'] = _EVALUATIONS_ADAPTER.validate_python(data['evaluations'])
         return data
 
+    def _serialize_fields(self, state: Dict[str, Any]) -> Dict[str, str]:
+        """Serializes the top-level fields of the state that live directly in the hash."""
+        return {
+            field: self._serialize_data(value)
+            for field, value in state.items()
+            if field != QUESTIONS_FIELD and field not in LIST_FIELDS
+        }
+
+    def _expire_all(self, pipe, answer_count: int):
+        """Refreshes the 24-hour expiry on every key that belongs to the session."""
+        pipe.expire(self.session_key, SESSION_TTL)
+        for field in LIST_FIELDS:
+            pipe.expire(self._list_key(field), SESSION_TTL)
+        for question_index in range(answer_count):
+            pipe.expire(self._dataframe_key(question_index), SESSION_TTL)
+
     def get_session_state(self) -> Optional[Dict[str, Any]]:
         """
         Retrieves the entire session state from Redis.
         Returns None if the session does not exist.
         """
-        stored_state = self.redis_conn.get(self.session_key)
-        if stored_state:
-            return self._deserialize_data(stored_state)
+        pipe = self.redis_conn.pipeline()
+        pipe.hgetall(self.session_key)
+        for field in LIST_FIELDS:
+            pipe.lrange(self._list_key(field), 0, -1)
+        stored_fields, *stored_lists = pipe.execute()
+
+        if stored_fields:
+            return self._deserialize_data(stored_fields, dict(zip(LIST_FIELDS, stored_lists)))
         return None
 
-    def save_session_state(self, state: Dict[str, Any]):
+    def save_session_fields(self, state: Dict[str, Any]):
         """
-        Saves the entire session state to Redis.
+        Saves only the top-level session fields to Redis.
+        Questions, answers and evaluations are NOT persisted here: they are written
+        by create_new_session and save_submission, so use save_submission after
+        appending an answer and evaluation.
         The state is set to expire after 24 hours.
         """
-        serialized_state = self._serialize_data(state)
-        self.redis_conn.set(self.session_key, serialized_state, ex=86400) # 24-hour expiry
+        pipe = self.redis_conn.pipeline()
+        pipe.hset(self.session_key, mapping=self._serialize_fields(state))
+        self._expire_all(pipe, len(state.get("user_answers", [])))
+        pipe.execute()
+
+    def save_submission(self, state: Dict[str, Any]):
+        """
+        Persists the latest submission: appends the newest answer and evaluation
+        and updates the top-level fields, all in a single round-trip.
+        """
+        pipe = self.redis_conn.pipeline()
+        pipe.hset(self.session_key, mapping=self._serialize_fields(state))
+        for field in LIST_FIELDS:
+            if state.get(field):
+                pipe.rpush(self._list_key(field), self._serialize_data(state[field][-1]))
+        self._expire_all(pipe, len(state.get("user_answers", [])))
+        pipe.execute()
+
+    def _dataframe_key(self, question_index: int) -> str:
+        """Returns the Redis key of the submitted DataFrame for a question."""
+        return f"{self.session_key}:df:{question_index}"
+
+    def save_answer_dataframe(self, question_index: int, df: pd.DataFrame):
+        """
+        Stores the candidate's final DataFrame for a question as Arrow IPC bytes,
+        separately from the session hash so it is written once, on submit.
+        Failures are logged and otherwise ignored so they never block a submission.
+        """
+        try:
+            table = pa.Table.from_pandas(df)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            self.redis_binary_conn.set(self._dataframe_key(question_index), sink.getvalue().to_pybytes(), ex=SESSION_TTL)
+        except Exception as e:
+            logger.warning("Could not store DataFrame for question %s of session %s: %s", question_index, self.session_id, e)
+
+    def _decode_dataframe(self, stored_df: Optional[bytes]) -> Optional[pd.DataFrame]:
+        """Decodes Arrow IPC bytes back into a DataFrame. Returns None if missing or unreadable."""
+        if not stored_df:
+            return None
+        try:
+            return pa.ipc.open_stream(stored_df).read_pandas()
+        except Exception as e:
+            logger.warning("Could not decode stored DataFrame for session %s: %s", self.session_id, e)
+            return None
+
+    def get_answer_dataframe(self, question_index: int) -> Optional[pd.DataFrame]:
+        """
+        Retrieves the candidate's final DataFrame for a question.
+        Returns None if it was never stored or has expired.
+        """
+        return self._decode_dataframe(self.redis_binary_conn.get(self._dataframe_key(question_index)))
+
+    def get_answer_dataframes(self, answer_count: int) -> List[Optional[pd.DataFrame]]:
+        """
+        Retrieves the candidate's final DataFrames for the first answer_count questions
+        in a single round-trip. Missing entries are None.
+        """
+        if answer_count <= 0:
+            return []
+        keys = [self._dataframe_key(question_index) for question_index in range(answer_count)]
+        return [self._decode_dataframe(stored_df) for stored_df in self.redis_binary_conn.mget(keys)]
 
     def create_new_session(self, questions: List[Question]) -> Dict[str, Any]:
         """
@@ -82,5 +219,14 @@ class SessionManager:
             "interview_started": False,
             "interview_finished": False
         }
-        self.save_session_state(initial_state)
+        pipe = self.redis_conn.pipeline()
+        # Start from a clean slate in case a stale session shares this ID
+        pipe.delete(
+            self.session_key,
+            *(self._list_key(field) for field in LIST_FIELDS),
+            *(self._dataframe_key(question_index) for question_index in range(len(questions))),
+        )
+        pipe.hset(self.session_key, QUESTIONS_FIELD, self._serialize_data(questions))
+        pipe.execute()
+        self.save_session_fields(initial_state)
         return initial_state
\ No newline at end of file
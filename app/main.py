@@ -4,15 +4,20 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 import uuid
+import logging
+
+# --- Configure Logging ---
+# Configured once here, before the project modules below log during import.
+logging.basicConfig(level=logging.INFO)
 
 # --- Import Project Modules ---
 # These are the components we've built in the previous steps.
 from core.config import settings
-from core.models import Question
+from core.models import Question, Evaluation
 from core.agent import excel_agent
 from database.redis_db import SessionManager
 from database.postgres_db import init_db, save_interview_report
-from utils.helpers import load_questions # We'll create this helper next
+from utils.helpers import load_questions, get_starting_df, get_solution_df
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -78,7 +83,7 @@ def start_screen(session_manager: SessionManager):
         session_state = session_manager.create_new_session(questions=all_questions)
         session_state["interview_started"] = True
         session_state["start_time"] = datetime.now().isoformat()
-        session_manager.save_session_state(session_state)
+        session_manager.save_session_fields(session_state)
         st.rerun()
 
 
@@ -92,9 +97,10 @@ def interview_screen(session_manager: SessionManager, state: dict):
     st.markdown(f"**Instructions:** {current_question.task_description}")
     
     # --- Data Editor ---
-    # We use a copy of the starting dataframe for the editor.
+    # The starting dataframe is shared across sessions and must stay read-only;
+    # st.data_editor copies its input, so the candidate's edits never touch it.
     if 'current_df' not in st.session_state or st.session_state.get('question_id') != current_question.id:
-        st.session_state['current_df'] = current_question.get_starting_df()
+        st.session_state['current_df'] = get_starting_df(current_question)
         st.session_state['question_id'] = current_question.id
 
     edited_df = st.data_editor(
@@ -109,17 +115,34 @@ def interview_screen(session_manager: SessionManager, state: dict):
     if st.button("Submit and Next Task", key=f"submit_{current_question.id}"):
         with st.spinner("Evaluating your submission..."):
             # --- 1. State Analysis (Programmatic Check) ---
-            solution_df = current_question.get_solution_df()
-            is_state_correct = solution_df.equals(edited_df)
+            solution_df = get_solution_df(current_question)
+            # Cheap shape/column checks first; DataFrame.equals only runs when they match
+            is_state_correct = (
+                edited_df.shape == solution_df.shape
+                and list(edited_df.columns) == list(solution_df.columns)
+                and solution_df.equals(edited_df)
+            )
             
             # --- 2. Formula Analysis (AI Evaluation) ---
-            ai_evaluation = excel_agent.evaluate_formula(current_question, formula)
+            if is_state_correct and current_question.is_canonical_formula(formula):
+                # Correct result with a known-good formula: no need to ask the LLM.
+                ai_evaluation = Evaluation(score=5, is_correct=True, feedback="Matches expected solution.")
+            else:
+                # Stream the evaluation so the score shows up as soon as the LLM emits it.
+                score_placeholder = st.empty()
+                evaluation_result = None
+                for partial in excel_agent.stream_evaluate(current_question, formula):
+                    evaluation_result = partial
+                    if 'score' in partial:
+                        score_placeholder.markdown(f"**Score:** {partial['score']} / 5")
+                ai_evaluation = Evaluation(**evaluation_result) if evaluation_result else None
             
             # --- 3. Update Session State ---
+            # The final DataFrame is stored on its own as Arrow bytes rather than in the session state.
+            session_manager.save_answer_dataframe(q_index, edited_df)
             state["user_answers"].append({
                 "question_id": current_question.id,
                 "submitted_formula": formula,
-                "final_dataframe": edited_df.to_dict('list'),
                 "is_state_correct": is_state_correct
             })
             state["evaluations"].append(ai_evaluation.model_dump()) # Store as dict
@@ -129,10 +152,15 @@ def interview_screen(session_manager: SessionManager, state: dict):
             if state["current_question_index"] >= len(questions):
                 state["interview_finished"] = True
                 state["end_time"] = datetime.now().isoformat()
-                save_interview_report(state) # Save to PostgreSQL
+                # The submitted tables only live in Redis, so include them in the permanent report
+                final_dataframes = [
+                    df.to_dict('list') if df is not None else None
+                    for df in session_manager.get_answer_dataframes(len(state["user_answers"]))
+                ]
+                save_interview_report(state, final_dataframes) # Save to PostgreSQL
             
-            # Save the updated state to Redis and rerun the app
-            session_manager.save_session_state(state)
+            # Save the new submission to Redis and rerun the app
+            session_manager.save_submission(state)
             # Clear local state for the next question
             del st.session_state['current_df']
             st.rerun()
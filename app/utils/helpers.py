@@ -1,10 +1,13 @@
 # app/utils/helpers.py
 
 import json
-from typing import List
+from functools import lru_cache
+from typing import Dict, List, Tuple
 import os
 import uuid
 
+import pandas as pd
+
 from app.core.models import Question
 
 # Get the absolute path to the static directory
@@ -12,21 +15,51 @@ from app.core.models import Question
 STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static')
 QUESTIONS_FILE = os.path.join(STATIC_DIR, 'questions.json')
 
+# Prebuilt DataFrames keyed by question ID, so no DataFrame is rebuilt at request time.
+# They are shared across sessions and must be treated as read-only.
+_STARTING_DFS: Dict[str, pd.DataFrame] = {}
+_SOLUTION_DFS: Dict[str, pd.DataFrame] = {}
+
+@lru_cache(maxsize=1)
+def _read_questions() -> Tuple[Question, ...]:
+    """
+    Parses and validates the questions file. The file is static, so the result
+    is cached for the lifetime of the process. Errors propagate and are not cached.
+    """
+    with open(QUESTIONS_FILE, 'r') as f:
+        questions_data = json.load(f)
+
+    # Validate each question object against the Pydantic model
+    questions = tuple(Question(**q_data) for q_data in questions_data)
+
+    for question in questions:
+        _STARTING_DFS[question.id] = question.get_starting_df()
+        _SOLUTION_DFS[question.id] = question.get_solution_df()
+    return questions
+
 def load_questions() -> List[Question]:
     """
     Loads interview questions from the JSON file and validates them
     using the Question Pydantic model.
     """
     try:
-        with open(QUESTIONS_FILE, 'r') as f:
-            questions_data = json.load(f)
-        
-        # Validate each question object against the Pydantic model
-        return [Question(**q_data) for q_data in questions_data]
+        return list(_read_questions())
     except (FileNotFoundError, json.JSONDecodeError, TypeError) as e:
         print(f"Error loading questions: {e}")
         return []
 
+def get_starting_df(question: Question) -> pd.DataFrame:
+    """Returns the shared starting DataFrame for a question, building it on first use."""
+    if question.id not in _STARTING_DFS:
+        _STARTING_DFS[question.id] = question.get_starting_df()
+    return _STARTING_DFS[question.id]
+
+def get_solution_df(question: Question) -> pd.DataFrame:
+    """Returns the shared solution DataFrame for a question, building it on first use."""
+    if question.id not in _SOLUTION_DFS:
+        _SOLUTION_DFS[question.id] = question.get_solution_df()
+    return _SOLUTION_DFS[question.id]
+
 def generate_session_id() -> str:
     """Generates a new unique session ID."""
     return str(uuid.uuid4())
\ No newline at end of file